@@ -1,8 +1,5 @@
-from requests.auth import AuthBase
-
-
-class BytesApiAuth(AuthBase):
-    """ BytesviewApi authorization header update """
+class BytesApiAuth(object):
+    """ BytesviewApi authorization header update, usable as the auth of requests and HTTPClientSession """
 
     """
     :param api_key: your API key.
@@ -1,10 +1,11 @@
-import requests
 from bytesviewapi.api_authentication import BytesApiAuth
 from bytesviewapi import constants
+from bytesviewapi.endpoints import get_endpoint
 from bytesviewapi.utils import is_valid_dict
-import json
 from bytesviewapi.bytesviewapi_exception import BytesviewException
-from bytesviewapi.helpers import post, MaxRetries
+from bytesviewapi.helpers import dumps, post, MaxRetries
+from bytesviewapi.transport import default_session
+from bytesviewapi.usage import UsageTracker
 
 
 class BytesviewApiClient(object):
@@ -19,15 +20,16 @@ class BytesviewApiClient(object):
         :param session: Default value for this argument is None but if you’re making several requests to the same host, 
                         the underlying TCP connection will be reused, which can result in a significant performance increase. 
                         Please make sure call session.close() after execute all calls to free up resource.   
-        :type session: requests.Session
+                        Use bytesviewapi.transport.HTTPClientSession for a session which does not need requests.
+        :type session: requests.Session or HTTPClientSession
         """        
         
         self.api_key = api_key
         # BytesviewAPI request header 
         self.header = BytesApiAuth(api_key=self.api_key)
-        # Check if session argument is None 
+        # Check if session argument is None, requests is only imported here and falls back to http.client
         if session is None:
-            self.request_method = requests
+            self.request_method = default_session()
         else:
             self.request_method = session
         
@@ -41,6 +43,13 @@ class BytesviewApiClient(object):
         # set request timeout
         self.request_timeout = constants.DEFAULT_REQUEST_TIMEOUT
 
+        # Middlewares wrapping every API call, composed once into a single handler
+        self.middlewares = []
+        self._handler = self._send
+
+        # Usage counters and budgets of this client
+        self.usage = UsageTracker()
+
     def set_retries( self, max_retries=0, retry_delay = 0):
         """ API maximum retry and delay when getting 500 error """
         
@@ -72,106 +81,129 @@ class BytesviewApiClient(object):
         """
         self.proxies = proxies
 
-    def sentiment_api( self, data=None, lang="en"):
-        """ Sending POST request to the sentiment api"""
-        
+    def set_budget( self, items_per_day=None, requests_per_minute=None, endpoint=None, on_exceed=None, max_wait=None):
+        """ Limit the items and requests sent by this client """
+
         """
-        :param data: pass your desired strings in the dictionary format where each string has some unique key. (ex. {0: "this is good"})
-        :type data: dictionary
-        :param lang: ISO code for supported language, Default laguage is english(en) 
-        :type lang: string
-        :return: server response in JSON object 
+        Limits are merged into the current budget of the endpoint, arguments left to None keep their value and
+        changing a limit keeps what was already spent. Use clear_budget to drop limits.
+
+        :param items_per_day: Maximum number of items over any rolling 24 hours, Default value is None to keep the current limit.
+        :type items_per_day: integer
+        :param requests_per_minute: Maximum number of requests, retries included, over any rolling minute. Default value is None to keep the current limit.
+        :type requests_per_minute: integer
+        :param endpoint: Name of the endpoint the budget applies to (ex. "sentiment"), Default value is None for all endpoints.
+        :type endpoint: string
+        :param on_exceed: "throttle" waits until the budget allows the request, "refuse" raises BudgetExceededException.
+                          Default value is None to keep the current behaviour, "throttle" for a new budget.
+        :type on_exceed: string
+        :param max_wait: Maximum seconds to wait when throttling before raising BudgetExceededException, float("inf") to
+                         wait as long as needed. Default value is None to keep the current value, 60 for a new budget.
+        :type max_wait: number
         """
-        
-        payload = {}
+        if endpoint is not None:
+            endpoint = get_endpoint(endpoint).name
+        self.usage.set_budget(endpoint, items_per_day, requests_per_minute, on_exceed, max_wait)
 
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
+    def clear_budget( self, endpoint=None, limits=None):
+        """ Remove limits set with set_budget """
 
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
+        """
+        :param endpoint: Name of the endpoint (ex. "sentiment"), Default value is None for the budget of all endpoints.
+        :type endpoint: string
+        :param limits: Names of the limits to drop ("items_per_day", "requests_per_minute"), Default value is None to drop
+                       the whole budget of the endpoint.
+        :type limits: list
+        """
+        if endpoint is not None:
+            endpoint = get_endpoint(endpoint).name
+        self.usage.clear_budget(endpoint, limits)
 
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.SENTIMENT_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
+    def usage_snapshot( self):
+        """ Return the usage of this client per endpoint """
 
-        # Make a POST request to constants.SENTIMENT_URL 
-        response = post(self.request_method,  constants.SENTIMENT_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.SENTIMENT_URL, self.header, payload, self.proxies, self.request_timeout)
+        """
+        :return: dictionary with the counters ("items", "requests", "retries", "cache_avoided_items", "request_bytes",
+                 "response_bytes") of each endpoint under "endpoints", their sum under "total" and the limits and
+                 current use of the budgets under "budgets"
+        """
+        return self.usage.snapshot()
 
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
+    def add_middleware( self, middleware):
+        """ Register a middleware around every API call """
+
+        """
+        :param middleware: A callable middleware(endpoint, payload, call_next) which must return the decoded response,
+                           usually by returning call_next(endpoint, payload). Middlewares added later wrap the earlier ones.
+        :type middleware:  callable
+        """
+        self.middlewares.append(middleware)
 
+        # Compose the handler chain here so that each call only pays for the middlewares themselves
+        handler = self._send
+        for item in self.middlewares:
+            handler = _wrap(item, handler)
+        self._handler = handler
+
+    def dispatch( self, endpoint, data=None, lang="en"):
+        """ Validate the input and send POST request to any registered endpoint """
 
-    def emotion_api( self, data=None, lang="en"):
-        """ Sending POST request to the emotion api"""
-        
         """
+        :param endpoint: Name of the endpoint, see bytesviewapi.endpoints.ENDPOINTS (ex. "sentiment").
+        :type endpoint: string
         :param data: pass your desired strings in the dictionary format where each string has some unique key. (ex. {0: "this is good"})
         :type data: dictionary
-        :param lang: ISO code for supported language, Default laguage is english(en) 
+        :param lang: ISO code for supported language, ignored by endpoints which do not take a language.
         :type lang: string
-        :return: server response in JSON object 
+        :return: server response in JSON object
         """
-        
-        payload = {}
+        endpoint = get_endpoint(endpoint)
 
         if self.api_key is None:
             raise ValueError("Please provide your private API Key")
 
         # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
+        if data is None:
             raise ValueError("Please provide data, data can not be empty")
+        if not is_valid_dict(data):
+            raise TypeError("Data should be of type dictionary")
 
         # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.EMOTION_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
+        if endpoint.takes_lang:
+            if not isinstance(lang, str):
+                raise TypeError("Language input should be an string")
+            if lang not in endpoint.languages:
                 raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
 
-        # Make a POST request to constants.EMOTION_URL
-        response = post(self.request_method,  constants.EMOTION_URL, self.header, payload, self.proxies, self.request_timeout)
-        
+        return self._handler(endpoint, endpoint.build_payload(data, lang))
+
+    def _send( self, endpoint, payload):
+        """ Serialize the payload, POST it with retries and decode the response """
+
+        # Serialize once, retries reuse the same body
+        body = dumps(payload)
+        # Budgets are checked before every request, retries included
+        self.usage.before_request(endpoint.name, endpoint.count_items(payload["data"]), len(body))
+        response = post(self.request_method, endpoint.url, self.header, body, self.proxies, self.request_timeout)
+
         if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.EMOTION_URL, self.header, payload, self.proxies, self.request_timeout) 
+            def on_retry(failed):
+                self.usage.record_response(endpoint.name, len(getattr(failed, "content", b"")))
+                self.usage.before_retry(endpoint.name, len(body))
+
+            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, endpoint.url, self.header, body, self.proxies, self.request_timeout, on_retry)
 
+        self.usage.record_response(endpoint.name, len(getattr(response, "content", b"")))
 
         # Check the status code of the response if not equal to 200, then raise exception
         if response.status_code != 200:
             raise BytesviewException(response.json())
-        
+
         # Return the response json
         return response.json()
 
-    def keywords_api( self, data=None, lang="en"):
-        """ Sending POST request to the keywords api"""
+    def sentiment_api( self, data=None, lang="en"):
+        """ Sending POST request to the sentiment api"""
         
         """
         :param data: pass your desired strings in the dictionary format where each string has some unique key. (ex. {0: "this is good"})
@@ -180,44 +212,36 @@ class BytesviewApiClient(object):
         :type lang: string
         :return: server response in JSON object 
         """
-        
-        payload = {}
 
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
+        return self.dispatch("sentiment", data, lang)
 
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
 
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.KEYWORDS_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
+    def emotion_api( self, data=None, lang="en"):
+        """ Sending POST request to the emotion api"""
         
+        """
+        :param data: pass your desired strings in the dictionary format where each string has some unique key. (ex. {0: "this is good"})
+        :type data: dictionary
+        :param lang: ISO code for supported language, Default laguage is english(en) 
+        :type lang: string
+        :return: server response in JSON object 
+        """
 
-        # Make a POST request to constants.KEYWORDS_URL
-        response = post(self.request_method,  constants.KEYWORDS_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.KEYWORDS_URL, self.header, payload, self.proxies, self.request_timeout) 
+        return self.dispatch("emotion", data, lang)
 
 
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
+    def keywords_api( self, data=None, lang="en"):
+        """ Sending POST request to the keywords api"""
         
-        # Return the response json
-        return response.json()
+        """
+        :param data: pass your desired strings in the dictionary format where each string has some unique key. (ex. {0: "this is good"})
+        :type data: dictionary
+        :param lang: ISO code for supported language, Default laguage is english(en) 
+        :type lang: string
+        :return: server response in JSON object 
+        """
+
+        return self.dispatch("keywords", data, lang)
 
 
     def semantic_api( self, data=None, lang="en"):
@@ -230,44 +254,31 @@ class BytesviewApiClient(object):
         :type lang: string
         :return: server response in JSON object 
         """
-        
-        payload = {}
 
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
+        return self.dispatch("semantic", data, lang)
 
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
 
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.SEMANTIC_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
+    def semantic_matrix( self, queries, candidates=None, lang="en", max_workers=8, top_k=None, threshold=None):
+        """ Score a list of strings against another list (or all pairs of one list) with the semantic api"""
 
-        # Make a POST request to constants.SEMANTIC_URL
-        response = post(self.request_method,  constants.SEMANTIC_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.SEMANTIC_URL, self.header, payload, self.proxies, self.request_timeout)
+        """
+        :param queries: Strings to compare, the rows of the matrix. (ex. ["this is good", "this is bad"])
+        :type queries: list
+        :param candidates: Strings to compare each query with, Default value is None which scores all pairs of queries.
+        :type candidates: list
+        :param lang: ISO code for supported language, Default laguage is english(en)
+        :type lang: string
+        :param max_workers: Maximum number of concurrent API calls, Default value is 8.
+        :type max_workers: integer
+        :param top_k: Stop scoring a query once it has top_k matches (scores of at least threshold, or perfect scores).
+        :type top_k: integer
+        :param threshold: Scores below threshold are pruned from the matrix.
+        :type threshold: number
+        :return: bytesviewapi.similarity.SimilarityMatrix
+        """
+        from bytesviewapi.similarity import semantic_matrix
 
-
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
+        return semantic_matrix(self, queries, candidates, lang, max_workers, top_k, threshold)
 
 
     def name_gender_api( self, data=None):
@@ -278,34 +289,8 @@ class BytesviewApiClient(object):
         :type data: dictionary
         :return: server response in JSON object 
         """
-        
-        payload = {}
-
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
-
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
-
-        # Make a POST request to constants.NAME_GENDER_URL
-        response = post(self.request_method,  constants.NAME_GENDER_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.NAME_GENDER_URL, self.header, payload, self.proxies, self.request_timeout)
 
-
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
+        return self.dispatch("name_gender", data)
 
 
     def ner_api( self, data=None, lang="en"):
@@ -318,44 +303,8 @@ class BytesviewApiClient(object):
         :type lang: string
         :return: server response in JSON object 
         """
-        
-        payload = {}
 
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
-
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
-
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.NER_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
-
-        # Make a POST request to constants.NER_URL
-        response = post(self.request_method,  constants.NER_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.NER_URL, self.header, payload, self.proxies, self.request_timeout)
-
-
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
+        return self.dispatch("ner", data, lang)
 
 
     def intent_api( self, data=None, lang="en"):
@@ -368,44 +317,8 @@ class BytesviewApiClient(object):
         :type lang: string
         :return: server response in JSON object 
         """
-        
-        payload = {}
-
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
-
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
-
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.INTENT_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
 
-        # Make a POST request to constants.INTENT_URL
-        response = post(self.request_method,  constants.INTENT_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.INTENT_URL, self.header, payload, self.proxies, self.request_timeout) 
-
-
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
+        return self.dispatch("intent", data, lang)
 
 
     def feature_api( self, data=None, lang="en"):
@@ -418,44 +331,8 @@ class BytesviewApiClient(object):
         :type lang: string
         :return: server response in JSON object 
         """
-        
-        payload = {}
-
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
-
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
-
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.FEATURE_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
 
-        # Make a POST request to constants.FEATURE_URL
-        response = post(self.request_method,  constants.FEATURE_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.FEATURE_URL, self.header, payload, self.proxies, self.request_timeout) 
-
-
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
+        return self.dispatch("feature", data, lang)
 
 
     def topic_api( self, data=None, lang="en"):
@@ -468,41 +345,12 @@ class BytesviewApiClient(object):
         :type lang: string
         :return: server response in JSON object 
         """
-        
-        payload = {}
 
-        if self.api_key is None:
-            raise ValueError("Please provide your private API Key")
+        return self.dispatch("topic", data, lang)
 
-        # Check if valid data dictionary
-        if data is not None:
-            if is_valid_dict(data):
-                payload["data"] = data
-            else:
-                raise TypeError("Data should be of type dictionary")
-        else:
-            raise ValueError("Please provide data, data can not be empty")
 
-        # Check if valid language string
-        if isinstance(lang, str):
-            if lang in constants.TOPIC_LANGUAGES_SUPPORT:
-                payload["lang"] = lang
-            else:
-                raise ValueError("Please provide valid Language code, check documentation for supported languages")
-        else:
-            raise TypeError("Language input should be an string")
-        
-
-        # Make a POST request to constants.TOPIC_URL
-        response = post(self.request_method,  constants.TOPIC_URL, self.header, payload, self.proxies, self.request_timeout)
-        
-        if response.status_code == 500:
-            response = MaxRetries(response, self.max_retries, self.retry_delay, self.request_method, constants.TOPIC_URL, self.header, payload, self.proxies, self.request_timeout) 
-
-
-        # Check the status code of the response if not equal to 200, then raise exception
-        if response.status_code != 200:
-            raise BytesviewException(response.json())
-        
-        # Return the response json
-        return response.json()
\ No newline at end of file
+def _wrap(middleware, call_next):
+    """ Bind a middleware to the next handler of the chain """
+    def handler(endpoint, payload):
+        return middleware(endpoint, payload, call_next)
+    return handler
@@ -4,4 +4,8 @@ class BytesviewException(Exception):
     """Base class for all other exceptions"""
 
     def __init__(self, Error):
-        self.Error = Error
\ No newline at end of file
+        self.Error = Error
+
+
+class BudgetExceededException(BytesviewException):
+    """Raised when a request would exceed the usage budget of the client"""
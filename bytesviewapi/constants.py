@@ -23,6 +23,8 @@ KEYWORDS_LANGUAGES_SUPPORT = {'en', 'fr', 'de', 'da', 'it', 'es', 'zh', "ja", "r
 # Semantic URL 
 SEMANTIC_URL = BASE_URL + 'static/semantic'
 SEMANTIC_LANGUAGES_SUPPORT = {"en"}
+# Score returned by the semantic API for identical strings
+SEMANTIC_MAX_SCORE = 100
 
 
 # Name-gender URL 
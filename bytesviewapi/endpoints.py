@@ -0,0 +1,66 @@
+# Registry of all the Bytesview API endpoints, built once from constants.
+from bytesviewapi import constants
+
+
+class Endpoint(object):
+    """ Description of a single Bytesview API endpoint """
+
+    """
+    :param name: Short name of the endpoint (ex. "sentiment").
+    :type name: string
+    :param url: Full URL of the endpoint.
+    :type url: string
+    :param languages: Set of supported ISO language codes, None if the endpoint does not take a language.
+    :type languages: set or None
+    :param single_item: True if the whole data dictionary is a single item (ex. the two strings of semantic).
+    :type single_item: boolean
+    """
+
+    __slots__ = ("name", "url", "languages", "single_item")
+
+    def __init__(self, name, url, languages=None, single_item=False):
+        self.name = name
+        self.url = url
+        self.languages = frozenset(languages) if languages is not None else None
+        self.single_item = single_item
+
+    @property
+    def takes_lang(self):
+        """ True if the payload of this endpoint carries a "lang" field """
+        return self.languages is not None
+
+    def count_items(self, data):
+        """ Number of billed items in a data dictionary """
+        return 1 if self.single_item else len(data)
+
+    def build_payload(self, data, lang):
+        """ Build the request payload, the caller is responsible for validating the inputs """
+        if self.languages is None:
+            return {"data": data}
+        return {"data": data, "lang": lang}
+
+    def __repr__(self):
+        return "Endpoint({!r}, {!r})".format(self.name, self.url)
+
+
+ENDPOINTS = {
+    endpoint.name: endpoint for endpoint in (
+        Endpoint("sentiment", constants.SENTIMENT_URL, constants.SENTIMENT_LANGUAGES_SUPPORT),
+        Endpoint("emotion", constants.EMOTION_URL, constants.EMOTION_LANGUAGES_SUPPORT),
+        Endpoint("keywords", constants.KEYWORDS_URL, constants.KEYWORDS_LANGUAGES_SUPPORT),
+        Endpoint("semantic", constants.SEMANTIC_URL, constants.SEMANTIC_LANGUAGES_SUPPORT, single_item=True),
+        Endpoint("name_gender", constants.NAME_GENDER_URL),
+        Endpoint("ner", constants.NER_URL, constants.NER_LANGUAGES_SUPPORT),
+        Endpoint("intent", constants.INTENT_URL, constants.INTENT_LANGUAGES_SUPPORT),
+        Endpoint("feature", constants.FEATURE_URL, constants.FEATURE_LANGUAGES_SUPPORT),
+        Endpoint("topic", constants.TOPIC_URL, constants.TOPIC_LANGUAGES_SUPPORT),
+    )
+}
+
+
+def get_endpoint(name):
+    """ Look up an endpoint by name, raise ValueError for unknown endpoints """
+    try:
+        return ENDPOINTS[name]
+    except KeyError:
+        raise ValueError("Unknown endpoint {!r}, supported endpoints are: {}".format(name, ", ".join(sorted(ENDPOINTS))))
@@ -1,11 +1,17 @@
 import json
 import time
 
+def dumps(payload):
+    """ Serialize the payload to a compact JSON string """
+    return json.dumps(payload, separators=(",", ":"))
+
 def post(request_method, URL, header, payload, proxies, request_timeout):
+    # Payload may already be serialized, so that retries do not encode it again
+    data = payload if isinstance(payload, str) else dumps(payload)
     if proxies is None:
-        return request_method.post(URL, auth=header, timeout=request_timeout, data=json.dumps(payload, indent = 4))
+        return request_method.post(URL, auth=header, timeout=request_timeout, data=data)
     else:
-        return request_method.post(URL, auth=header, timeout=request_timeout, data=json.dumps(payload, indent = 4), proxies = proxies)
+        return request_method.post(URL, auth=header, timeout=request_timeout, data=data, proxies = proxies)
 
 def get(request_method, URL, header, payload, proxies, request_timeout):
     if proxies is None:
@@ -14,9 +20,12 @@ def get(request_method, URL, header, payload, proxies, request_timeout):
         return request_method.get(URL, auth=header, timeout=request_timeout, proxies = proxies)
 
 
-def MaxRetries(response, max_retries, retry_delay, request_method, URL, header, payload, proxies, request_timeout):
+def MaxRetries(response, max_retries, retry_delay, request_method, URL, header, payload, proxies, request_timeout, on_retry=None):
     while (max_retries):
         time.sleep(retry_delay)
+        # Hook called with the failed response before each retry, it may raise to stop retrying
+        if on_retry is not None:
+            on_retry(response)
         response = post(request_method, URL, header, payload, proxies, request_timeout)
         if response.status_code!=500:
             break
@@ -0,0 +1,371 @@
+# Append-only, memory-mapped store for API results.
+import json
+import mmap
+import os
+import struct
+import zlib
+
+
+# Row record: key offset, key length, raw result offset, raw result length
+_ROW = struct.Struct("<QIQI")
+# Index header: magic, capacity, number of keys, number of rows indexed
+_INDEX_HEADER = struct.Struct("<8sQQQ")
+_INDEX_MAGIC = b"BVRSIDX2"
+# Index slot: key hash, row number + 1 (0 marks an empty slot)
+_SLOT = struct.Struct("<QQ")
+_COLUMN = struct.Struct("<d")
+
+# Capacity is always a power of two
+_INITIAL_CAPACITY = 1024
+_MAX_LOAD = 0.7
+# Rows are written to disk by batches before their keys are published in the index
+_BATCH_SIZE = 1024
+
+_NAN = float("nan")
+
+
+def _hash_key(key):
+    """ Stable 64-bit hash of an encoded key """
+    return (zlib.crc32(key) << 32) | zlib.adler32(key)
+
+
+def _to_float(value):
+    # Column cells are doubles, anything which is not a number is stored as NaN
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return _NAN
+    return float(value)
+
+
+class ResultStore(object):
+    """ Append-only columnar store of API results with an O(1) key index """
+
+    """
+    :param path: Directory of the store, created if it does not exist.
+    :type path: string
+    :param columns: Numeric fields of each result stored as separate columns (ex. ("label", "score")).
+                    Only required when creating a new store.
+    :type columns: tuple
+    """
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as fh:
+                stored = tuple(json.load(fh)["columns"])
+            if columns is not None and tuple(columns) != stored:
+                raise ValueError("Store columns are {}, can not open it with {}".format(stored, tuple(columns)))
+            self.columns = stored
+        else:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self.columns = tuple(columns or ())
+            with open(meta_path, "w") as fh:
+                json.dump({"columns": list(self.columns)}, fh)
+
+        for column in self.columns:
+            if not isinstance(column, str):
+                raise TypeError("Column names should be strings")
+
+        rows = self._recover()
+
+        self._files = {}
+        self._maps = {}
+        self._dirty = False
+        for name in self._data_files():
+            self._files[name] = open(os.path.join(self.path, name), "ab")
+
+        self._open_index(rows)
+
+    def _data_files(self):
+        return ("keys.dat", "raw.dat", "rows.dat") + tuple(column + ".col" for column in self.columns)
+
+    def _recover(self):
+        """ Drop the trailing rows left incomplete by an unclean shutdown and return the number of complete rows """
+        sizes = {}
+        for name in self._data_files():
+            file_path = os.path.join(self.path, name)
+            sizes[name] = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+
+        rows = sizes["rows.dat"] // _ROW.size
+        for column in self.columns:
+            rows = min(rows, sizes[column + ".col"] // _COLUMN.size)
+
+        keys_end = raw_end = 0
+        if rows:
+            with open(os.path.join(self.path, "rows.dat"), "rb") as fh:
+                while rows:
+                    fh.seek((rows - 1) * _ROW.size)
+                    key_offset, key_length, raw_offset, raw_length = _ROW.unpack(fh.read(_ROW.size))
+                    keys_end, raw_end = key_offset + key_length, raw_offset + raw_length
+                    if keys_end <= sizes["keys.dat"] and raw_end <= sizes["raw.dat"]:
+                        break
+                    rows -= 1
+                    keys_end = raw_end = 0
+
+        expected = {"keys.dat": keys_end, "raw.dat": raw_end, "rows.dat": rows * _ROW.size}
+        for column in self.columns:
+            expected[column + ".col"] = rows * _COLUMN.size
+        for name, size in expected.items():
+            if sizes[name] > size:
+                os.truncate(os.path.join(self.path, name), size)
+        return rows
+
+    # Memory maps
+
+    def _view(self, name):
+        """ Return a read-only map of a data file, remapped if the file grew since the last call """
+        if self._dirty:
+            for fh in self._files.values():
+                fh.flush()
+            self._dirty = False
+
+        size = self._files[name].tell()
+        current = self._maps.get(name)
+        if current is not None and len(current) == size:
+            return current
+        if size == 0:
+            return b""
+        with open(os.path.join(self.path, name), "rb") as fh:
+            view = mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ)
+        # Old maps are left to the garbage collector, column views may still reference them
+        self._maps[name] = view
+        return view
+
+    def _open_index(self, rows):
+        index_path = os.path.join(self.path, "index.dat")
+        if not os.path.exists(index_path) or os.path.getsize(index_path) == 0:
+            self._write_empty_index(index_path, _INITIAL_CAPACITY)
+
+        self._index_file = open(index_path, "r+b")
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        magic, self._capacity, self._count, self._indexed_rows = _INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != _INDEX_MAGIC:
+            raise ValueError("{} is not a result store index".format(index_path))
+
+        # The index does not match the rows after an unclean shutdown
+        if self._indexed_rows != rows:
+            self._rebuild_index(rows)
+
+    def _rebuild_index(self, rows):
+        """ Rebuild the index from the rows on disk """
+        capacity = _INITIAL_CAPACITY
+        while rows > capacity * _MAX_LOAD:
+            capacity *= 2
+
+        self._index.close()
+        self._index_file.close()
+        index_path = os.path.join(self.path, "index.dat")
+        self._write_empty_index(index_path, capacity)
+        self._index_file = open(index_path, "r+b")
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        self._capacity, self._count, self._indexed_rows = capacity, 0, 0
+
+        for row in range(rows):
+            self._index_row(self._row_key(row), row)
+        self._indexed_rows = rows
+        self._write_index_header()
+        self._index.flush()
+
+    @staticmethod
+    def _write_empty_index(index_path, capacity):
+        with open(index_path, "wb") as fh:
+            fh.write(_INDEX_HEADER.pack(_INDEX_MAGIC, capacity, 0, 0))
+            fh.truncate(_INDEX_HEADER.size + capacity * _SLOT.size)
+
+    def _write_index_header(self):
+        _INDEX_HEADER.pack_into(self._index, 0, _INDEX_MAGIC, self._capacity, self._count, self._indexed_rows)
+
+    def _grow_index(self):
+        """ Rebuild the index with twice the capacity """
+        old_index, old_capacity = self._index, self._capacity
+        index_path = os.path.join(self.path, "index.dat")
+        tmp_path = index_path + ".tmp"
+        self._write_empty_index(tmp_path, old_capacity * 2)
+
+        with open(tmp_path, "r+b") as fh:
+            new_index = mmap.mmap(fh.fileno(), 0)
+        self._index, self._capacity = new_index, old_capacity * 2
+        for slot in range(old_capacity):
+            key_hash, row = _SLOT.unpack_from(old_index, _INDEX_HEADER.size + slot * _SLOT.size)
+            if row:
+                position = self._probe_empty(key_hash)
+                _SLOT.pack_into(new_index, position, key_hash, row)
+        self._write_index_header()
+
+        new_index.flush()
+        old_index.close()
+        self._index_file.close()
+        os.replace(tmp_path, index_path)
+        self._index_file = open(index_path, "r+b")
+
+    def _slots(self, key_hash):
+        """ Yield slot positions of the linear probing sequence of a hash """
+        # Fibonacci hashing, adler32 alone clusters badly for short keys
+        slot = ((key_hash * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - self._capacity.bit_length() + 1)
+        while True:
+            yield _INDEX_HEADER.size + slot * _SLOT.size
+            slot = (slot + 1) & (self._capacity - 1)
+
+    def _probe_empty(self, key_hash):
+        for position in self._slots(key_hash):
+            if not _SLOT.unpack_from(self._index, position)[1]:
+                return position
+
+    def _find(self, key):
+        """ Return (slot position, row) of an encoded key, row is None if the key is not stored """
+        key_hash = _hash_key(key)
+        for position in self._slots(key_hash):
+            slot_hash, row = _SLOT.unpack_from(self._index, position)
+            if not row:
+                return position, None
+            if slot_hash == key_hash and self._row_key(row - 1) == key:
+                return position, row - 1
+
+    # Rows
+
+    def _row(self, row):
+        return _ROW.unpack_from(self._view("rows.dat"), row * _ROW.size)
+
+    def _row_key(self, row):
+        key_offset, key_length, _, _ = self._row(row)
+        return bytes(self._view("keys.dat")[key_offset:key_offset + key_length])
+
+    def __len__(self):
+        """ Number of distinct keys """
+        return self._count
+
+    @property
+    def rows(self):
+        """ Number of appended rows, including rows overwritten by a later append of the same key """
+        return self._files["rows.dat"].tell() // _ROW.size
+
+    def __contains__(self, key):
+        return self._find(str(key).encode("utf-8"))[1] is not None
+
+    def row_of(self, key):
+        """ Return the row number of the latest result of a key, raise KeyError if missing """
+        row = self._find(str(key).encode("utf-8"))[1]
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def get(self, key, default=None):
+        """ Return the latest result stored for a key """
+        try:
+            row = self.row_of(key)
+        except KeyError:
+            return default
+        _, _, raw_offset, raw_length = self._row(row)
+        return json.loads(self._view("raw.dat")[raw_offset:raw_offset + raw_length].decode("utf-8"))
+
+    def __getitem__(self, key):
+        result = self.get(key, self)
+        if result is self:
+            raise KeyError(key)
+        return result
+
+    def keys(self):
+        """ Iterate over the stored keys in insertion order """
+        for row in range(self.rows):
+            key = self._row_key(row)
+            # Skip rows overwritten by a later append of the same key
+            if self._find(key)[1] == row:
+                yield key.decode("utf-8")
+
+    def column(self, name):
+        """ Return a column as a memoryview of doubles mapped from disk, one cell per row """
+        if name not in self.columns:
+            raise KeyError(name)
+        view = self._view(name + ".col")
+        if not view:
+            return memoryview(b"").cast("d")
+        return memoryview(view).cast("d")
+
+    # Writes
+
+    def append(self, key, result):
+        """ Append the result of a single key, a later append of the same key replaces it """
+        self.extend(((key, result),))
+
+    def append_response(self, response):
+        """ Append every item of a batch API response (ex. the return value of sentiment_api) """
+        results = response["results"]
+        if not isinstance(results, dict) or not all(isinstance(value, dict) for value in results.values()):
+            raise TypeError("Response results should be a dictionary of results keyed by item")
+        self.extend(results.items())
+
+    def extend(self, items):
+        """ Append (key, result) pairs, results are streamed to disk as they are consumed """
+        batch = []
+        for key, result in items:
+            batch.append(self._write_row(key, result))
+            if len(batch) >= _BATCH_SIZE:
+                self._publish(batch)
+                batch = []
+        if batch:
+            self._publish(batch)
+
+    def _write_row(self, key, result):
+        """ Write a row to the data files and return (encoded key, row) """
+        files = self._files
+        encoded_key = str(key).encode("utf-8")
+        raw = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        row = self.rows
+
+        files["rows.dat"].write(_ROW.pack(files["keys.dat"].tell(), len(encoded_key), files["raw.dat"].tell(), len(raw)))
+        files["keys.dat"].write(encoded_key)
+        files["raw.dat"].write(raw)
+        for column in self.columns:
+            value = result.get(column) if isinstance(result, dict) else None
+            files[column + ".col"].write(_COLUMN.pack(_to_float(value)))
+        self._dirty = True
+        return encoded_key, row
+
+    def _publish(self, batch):
+        """ Add written rows to the index, only once their data is out of the write buffers """
+        for fh in self._files.values():
+            fh.flush()
+        self._dirty = False
+
+        for encoded_key, row in batch:
+            self._index_row(encoded_key, row)
+        self._indexed_rows = self.rows
+        self._write_index_header()
+
+    def _index_row(self, encoded_key, row):
+        position, previous = self._find(encoded_key)
+        _SLOT.pack_into(self._index, position, _hash_key(encoded_key), row + 1)
+        if previous is None:
+            self._count += 1
+            if self._count > self._capacity * _MAX_LOAD:
+                self._grow_index()
+
+    def flush(self):
+        """ Flush pending writes to disk """
+        for fh in self._files.values():
+            fh.flush()
+        self._dirty = False
+        self._index.flush()
+
+    def close(self):
+        """ Flush and release the files of the store """
+        self.flush()
+        for view in self._maps.values():
+            try:
+                view.close()
+            except BufferError:
+                # A column view is still in use, the map is released with it
+                pass
+        self._maps = {}
+        for fh in self._files.values():
+            fh.close()
+        self._index.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
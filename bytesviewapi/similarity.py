@@ -0,0 +1,201 @@
+# Similarity matrix helpers built on top of the semantic API.
+from array import array
+import math
+
+from bytesviewapi import constants
+from bytesviewapi.endpoints import get_endpoint
+
+
+class SimilarityMatrix(object):
+    """ Row-major matrix of semantic scores backed by a compact array of doubles """
+
+    """
+    :param queries: Strings of the matrix rows.
+    :type queries: list
+    :param candidates: Strings of the matrix columns.
+    :type candidates: list
+    :param scores: Flat row-major array('d') of len(queries) * len(candidates) scores, NaN where no score is known.
+    :type scores: array.array
+    :param all_pairs: True if the candidates are the queries themselves, the diagonal is then left out of top_k.
+    :type all_pairs: boolean
+    """
+
+    def __init__(self, queries, candidates, scores, all_pairs=False):
+        self.queries = queries
+        self.candidates = candidates
+        self.scores = scores
+        self.all_pairs = all_pairs
+
+    @property
+    def shape(self):
+        return (len(self.queries), len(self.candidates))
+
+    def __getitem__(self, index):
+        i, j = index
+        return self.scores[i * len(self.candidates) + j]
+
+    def row(self, i):
+        """ Return the scores of the i-th query as a list """
+        n = len(self.candidates)
+        return self.scores[i * n:(i + 1) * n].tolist()
+
+    def top_k(self, i, k):
+        """ Return the k best (candidate index, score) pairs of the i-th query, unknown scores are skipped """
+        # In all-pairs mode a string is not its own neighbour
+        scored = [(j, score) for j, score in enumerate(self.row(i))
+                  if not math.isnan(score) and not (self.all_pairs and j == i)]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def to_list(self):
+        """ Return the matrix as a list of rows """
+        return [self.row(i) for i in range(len(self.queries))]
+
+    def to_numpy(self):
+        """ Return the matrix as a 2-D numpy array sharing memory with the scores, requires numpy """
+        import numpy
+        return numpy.frombuffer(self.scores, dtype=numpy.float64).reshape(self.shape)
+
+
+def _validate_strings(strings, name):
+    if not isinstance(strings, (list, tuple)):
+        raise TypeError("{} should be of type list".format(name))
+    if not strings:
+        raise ValueError("Please provide {}, {} can not be empty".format(name, name))
+    for item in strings:
+        if not isinstance(item, str):
+            raise TypeError("{} should only contain strings".format(name))
+    return list(strings)
+
+
+def semantic_matrix(client, queries, candidates=None, lang="en", max_workers=8, top_k=None, threshold=None):
+    """ Score queries against candidates (or all pairs of queries) with concurrent semantic API calls """
+
+    """
+    :param client: Client used to call the semantic api.
+    :type client: BytesviewApiClient
+    :param queries: Strings to compare, the rows of the matrix.
+    :type queries: list
+    :param candidates: Strings to compare each query with, the columns of the matrix. When None all pairs of queries
+                       are scored and the matrix is symmetric.
+    :type candidates: list
+    :param lang: ISO code for supported language, Default laguage is english(en)
+    :type lang: string
+    :param max_workers: Maximum number of concurrent API calls.
+    :type max_workers: integer
+    :param top_k: Stop scoring a query once it has top_k matches, a match being a score of at least threshold or the
+                  maximum semantic score when no threshold is set. In all-pairs mode the diagonal is not a match.
+    :type top_k: integer
+    :param threshold: Scores below threshold are pruned from the matrix and stored as NaN.
+    :type threshold: number
+    :return: SimilarityMatrix, cells which were never scored because of top_k hold NaN
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    queries = _validate_strings(queries, "queries")
+    all_pairs = candidates is None
+    candidates = queries if all_pairs else _validate_strings(candidates, "candidates")
+    if max_workers < 1:
+        raise ValueError("max_workers should be at least 1")
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k should be at least 1")
+
+    # Same checks as dispatch, so that an invalid language fails before any work and even without API calls
+    if not isinstance(lang, str):
+        raise TypeError("Language input should be an string")
+    if lang not in get_endpoint("semantic").languages:
+        raise ValueError("Please provide valid Language code, check documentation for supported languages")
+
+    n_rows, n_cols = len(queries), len(candidates)
+    scores = array("d", [float("nan")]) * (n_rows * n_cols)
+    match_score = constants.SEMANTIC_MAX_SCORE if threshold is None else threshold
+    matches = [0] * n_rows
+
+    def row_done(i):
+        return top_k is not None and matches[i] >= top_k
+
+    def pair_done(i, j):
+        # In all-pairs mode the pair also fills row j, which may still need matches
+        return row_done(i) and (not all_pairs or row_done(j))
+
+    def store(i, j, score):
+        if threshold is not None and score < threshold:
+            return
+        for row, col in ((i, j), (j, i)) if all_pairs and i != j else ((i, j),):
+            if math.isnan(scores[row * n_cols + col]):
+                scores[row * n_cols + col] = score
+                # A string is not its own neighbour, the diagonal never counts toward top_k
+                if score >= match_score and not (all_pairs and row == col):
+                    matches[row] += 1
+
+    # Scores are symmetric, so the cache key is the unordered pair of strings
+    cache = {}
+    pending = {}
+    # Cells answered from an earlier or running request, reported to the usage accounting of the client
+    avoided = 0
+
+    def pairs():
+        for i in range(n_rows):
+            for j in range(i if all_pairs else 0, n_cols):
+                yield i, j
+
+    def key_of(i, j):
+        a, b = queries[i], candidates[j]
+        return (a, b) if a <= b else (b, a)
+
+    def score_pair(a, b):
+        response = client.semantic_api(data={"string1": a, "string2": b}, lang=lang)
+        return response["results"]["score"]
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            pair_iter = pairs()
+            exhausted = False
+            while True:
+                # Keep a bounded window in flight so that top_k can stop a row early
+                while not exhausted and len(running) < 2 * max_workers:
+                    try:
+                        i, j = next(pair_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if pair_done(i, j):
+                        continue
+                    key = key_of(i, j)
+                    if key[0] == key[1]:
+                        # Identical strings would never be sent, they are not counted as avoided
+                        store(i, j, constants.SEMANTIC_MAX_SCORE)
+                        continue
+                    if all_pairs:
+                        # The mirrored cell (j, i) is filled by symmetry instead of its own request
+                        avoided += 1
+                    if key in cache:
+                        store(i, j, cache[key])
+                        avoided += 1
+                    elif key in pending:
+                        pending[key].append((i, j))
+                        avoided += 1
+                    else:
+                        pending[key] = [(i, j)]
+                        running[executor.submit(score_pair, key[0], key[1])] = key
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        score = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    cache[key] = score
+                    for i, j in pending.pop(key):
+                        store(i, j, score)
+    finally:
+        client.usage.record_cache_avoided("semantic", avoided)
+
+    return SimilarityMatrix(queries, candidates, scores, all_pairs)
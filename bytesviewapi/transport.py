@@ -0,0 +1,152 @@
+# Transports used by BytesviewApiClient to send requests.
+import json
+import threading
+
+
+def default_session():
+    """ Return the requests module when it is installed, otherwise a HTTPClientSession """
+    try:
+        import requests
+    except ImportError:
+        return HTTPClientSession()
+    return requests
+
+
+class HTTPResponse(object):
+    """ Response of HTTPClientSession, exposing the parts of requests.Response used by the client """
+
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _PreparedRequest(object):
+    """ Request object handed to the auth callable, like requests.PreparedRequest """
+
+    def __init__(self, method, url, body):
+        self.method = method
+        self.url = url
+        self.body = body
+        self.headers = {}
+
+
+class HTTPClientSession(object):
+    """ Minimal transport built on http.client with keep-alive connections, usable without requests """
+
+    """
+    Pass an instance as the session argument of BytesviewApiClient. Connections are pooled per host and reused
+    between calls, it is safe to use from several threads. Please call close() to free up the connections.
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def post(self, url, auth=None, timeout=None, data=None, proxies=None):
+        """ Send a POST request and return a HTTPResponse """
+        # Imported here so that importing bytesviewapi stays cheap
+        import http.client
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        body = data.encode("utf-8") if isinstance(data, str) else data
+        request = _PreparedRequest("POST", url, body)
+        if auth is not None:
+            request = auth(request)
+
+        proxy = (proxies or {}).get(parts.scheme)
+        key = (parts.scheme, parts.hostname, parts.port, proxy)
+
+        # A pooled connection may have been closed by the server while idle. The request is sent again on a new
+        # connection only when the server can not have answered it: the send failed, or the connection closed
+        # before any byte of the response. Other failures are raised so that a request is never billed twice.
+        for reused in (True, False):
+            connection = self._acquire(key) if reused else None
+            if connection is None:
+                reused = False
+                connection = self._connect(parts, proxy, timeout)
+            elif connection.sock is not None:
+                connection.sock.settimeout(timeout)
+
+            try:
+                try:
+                    connection.request(request.method, path, body=request.body, headers=request.headers)
+                except (BrokenPipeError, ConnectionResetError):
+                    if reused:
+                        connection.close()
+                        continue
+                    raise
+                try:
+                    response = connection.getresponse()
+                except http.client.RemoteDisconnected:
+                    if reused:
+                        connection.close()
+                        continue
+                    raise
+                content = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            return HTTPResponse(response.status, content, dict(response.getheaders()))
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            return idle.pop() if idle else None
+
+    def _release(self, key, connection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    @staticmethod
+    def _connect(parts, proxy, timeout):
+        import http.client
+        from urllib.parse import urlsplit
+
+        if parts.scheme == "https":
+            connection_class = http.client.HTTPSConnection
+        elif parts.scheme == "http":
+            connection_class = http.client.HTTPConnection
+        else:
+            raise ValueError("Unsupported URL scheme {!r}".format(parts.scheme))
+
+        if proxy is None:
+            return connection_class(parts.hostname, parts.port, timeout=timeout)
+
+        # Tunnel through the proxy with CONNECT
+        proxy_parts = urlsplit(proxy)
+        connection = connection_class(proxy_parts.hostname, proxy_parts.port, timeout=timeout)
+        connection.set_tunnel(parts.hostname, parts.port)
+        return connection
+
+    def close(self):
+        """ Close all the pooled connections """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
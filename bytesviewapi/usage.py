@@ -0,0 +1,256 @@
+# Usage accounting and budgets of BytesviewApiClient.
+from collections import deque
+import threading
+import time
+
+from bytesviewapi.bytesviewapi_exception import BudgetExceededException
+
+
+_COUNTERS = ("items", "requests", "retries", "cache_avoided_items", "request_bytes", "response_bytes")
+
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_MINUTE = 60
+
+
+class _Window(object):
+    """ Rolling window of amounts spent over the last period seconds """
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.spent = deque()
+        self.used = 0
+
+    def _expire(self, now):
+        while self.spent and self.spent[0][0] <= now - self.period:
+            self.used -= self.spent.popleft()[1]
+
+    def wait_time(self, amount, now):
+        """ Seconds to wait before amount fits in the window, None if it never fits """
+        self._expire(now)
+        if amount > self.limit:
+            return None
+        excess = self.used + amount - self.limit
+        if excess <= 0:
+            return 0
+        # Wait until enough of the oldest spendings leave the window
+        for spent_at, spent in self.spent:
+            excess -= spent
+            if excess <= 0:
+                return spent_at + self.period - now
+
+    def spend(self, amount, now):
+        if amount:
+            self.spent.append((now, amount))
+            self.used += amount
+
+
+class Budget(object):
+    """ Limits on the items and requests sent to one endpoint or to all endpoints """
+
+    """
+    :param items_per_day: Maximum number of items over any rolling 24 hours, None for no limit.
+    :type items_per_day: integer
+    :param requests_per_minute: Maximum number of requests (retries included) over any rolling minute, None for no limit.
+    :type requests_per_minute: integer
+    :param on_exceed: "throttle" to wait until the budget allows the request, "refuse" to raise BudgetExceededException.
+    :type on_exceed: string
+    :param max_wait: Maximum seconds to wait when throttling, longer waits raise BudgetExceededException.
+                     float("inf") to wait as long as needed.
+    :type max_wait: number
+    """
+
+    def __init__(self, items_per_day=None, requests_per_minute=None, on_exceed="throttle", max_wait=60):
+        self.on_exceed = "throttle"
+        self.max_wait = 60
+        self.items = None
+        self.requests = None
+        self.update(items_per_day, requests_per_minute, on_exceed, max_wait)
+
+    def update(self, items_per_day=None, requests_per_minute=None, on_exceed=None, max_wait=None):
+        """ Merge new settings into the budget, None keeps the current value. Windows keep their spendings """
+        if on_exceed is not None and on_exceed not in ("throttle", "refuse"):
+            raise ValueError('on_exceed should be "throttle" or "refuse"')
+        if on_exceed is not None:
+            self.on_exceed = on_exceed
+        if max_wait is not None:
+            self.max_wait = max_wait
+        if items_per_day is not None:
+            if self.items is None:
+                self.items = _Window(items_per_day, SECONDS_PER_DAY)
+            else:
+                self.items.limit = items_per_day
+        if requests_per_minute is not None:
+            if self.requests is None:
+                self.requests = _Window(requests_per_minute, SECONDS_PER_MINUTE)
+            else:
+                self.requests.limit = requests_per_minute
+
+    def clear(self, limits):
+        """ Drop the named limits ("items_per_day", "requests_per_minute") with their spendings """
+        for limit in limits:
+            if limit == "items_per_day":
+                self.items = None
+            elif limit == "requests_per_minute":
+                self.requests = None
+            else:
+                raise ValueError('Unknown limit {!r}, limits are "items_per_day" and "requests_per_minute"'.format(limit))
+
+    @property
+    def empty(self):
+        """ True if the budget has no limit left """
+        return self.items is None and self.requests is None
+
+    def wait_time(self, items, requests, now):
+        """ Seconds to wait before spending items and requests, None if the budget can never allow them """
+        wait = 0
+        for window, amount in ((self.items, items), (self.requests, requests)):
+            if window is None or not amount:
+                continue
+            window_wait = window.wait_time(amount, now)
+            if window_wait is None:
+                return None
+            wait = max(wait, window_wait)
+        return wait
+
+    def spend(self, items, requests, now):
+        for window, amount in ((self.items, items), (self.requests, requests)):
+            if window is not None:
+                window.spend(amount, now)
+
+    def snapshot(self):
+        snapshot = {}
+        if self.items is not None:
+            snapshot["items_per_day"] = {"limit": self.items.limit, "used": self.items.used}
+        if self.requests is not None:
+            snapshot["requests_per_minute"] = {"limit": self.requests.limit, "used": self.requests.used}
+        return snapshot
+
+
+class UsageTracker(object):
+    """ Thread-safe per-endpoint usage counters with optional budgets """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._counters = {}
+        # Budgets keyed by endpoint name, None for the budget shared by all endpoints
+        self.budgets = {}
+
+    def set_budget(self, endpoint=None, items_per_day=None, requests_per_minute=None, on_exceed=None, max_wait=None):
+        """ Set limits on an endpoint, or on all endpoints when endpoint is None """
+
+        """
+        Limits are merged into the existing budget of the scope: None keeps the current value and a changed limit
+        keeps what was already spent in its window. Use clear_budget to drop limits.
+        """
+        with self._lock:
+            budget = self.budgets.get(endpoint)
+            if budget is not None:
+                budget.update(items_per_day, requests_per_minute, on_exceed, max_wait)
+            elif items_per_day is None and requests_per_minute is None:
+                raise ValueError("Please provide items_per_day or requests_per_minute, there is no budget to update")
+            else:
+                self.budgets[endpoint] = Budget(items_per_day, requests_per_minute, on_exceed or "throttle",
+                                                60 if max_wait is None else max_wait)
+
+    def clear_budget(self, endpoint=None, limits=None):
+        """ Drop the given limits of an endpoint, or of all endpoints when endpoint is None. None drops every limit """
+        with self._lock:
+            budget = self.budgets.get(endpoint)
+            if budget is None:
+                return
+            if limits is None:
+                del self.budgets[endpoint]
+                return
+            budget.clear(limits)
+            if budget.empty:
+                del self.budgets[endpoint]
+
+    def _counter(self, endpoint):
+        counter = self._counters.get(endpoint)
+        if counter is None:
+            counter = self._counters[endpoint] = dict.fromkeys(_COUNTERS, 0)
+        return counter
+
+    def _acquire(self, endpoint, items, requests):
+        """ Block until the budgets allow spending items and requests on endpoint, then spend them """
+        waited = 0
+        while True:
+            with self._lock:
+                now = self._clock()
+                budgets = [budget for budget in (self.budgets.get(None), self.budgets.get(endpoint)) if budget is not None]
+
+                wait = 0
+                for budget in budgets:
+                    budget_wait = budget.wait_time(items, requests, now)
+                    if budget_wait is None:
+                        refused = True
+                    elif budget.on_exceed == "refuse":
+                        refused = budget_wait > 0
+                    else:
+                        refused = waited + budget_wait > budget.max_wait
+                    if refused:
+                        raise BudgetExceededException(
+                            "Budget exceeded for the {} endpoint, {} items and {} requests refused".format(endpoint, items, requests))
+                    wait = max(wait, budget_wait)
+
+                if not wait:
+                    for budget in budgets:
+                        budget.spend(items, requests, now)
+                    return
+            # Sleep outside the lock so other threads can keep accounting
+            self._sleep(wait)
+            waited += wait
+
+    def before_request(self, endpoint, items, request_bytes):
+        """ Check the budgets and record a request carrying items """
+        self._acquire(endpoint, items, 1)
+        with self._lock:
+            counter = self._counter(endpoint)
+            counter["items"] += items
+            counter["requests"] += 1
+            counter["request_bytes"] += request_bytes
+
+    def before_retry(self, endpoint, request_bytes):
+        """ Check the budgets and record a retried request """
+        self._acquire(endpoint, 0, 1)
+        with self._lock:
+            counter = self._counter(endpoint)
+            counter["requests"] += 1
+            counter["retries"] += 1
+            counter["request_bytes"] += request_bytes
+
+    def record_response(self, endpoint, response_bytes):
+        with self._lock:
+            self._counter(endpoint)["response_bytes"] += response_bytes
+
+    def record_cache_avoided(self, endpoint, items):
+        """ Record items which were answered without calling the API """
+        with self._lock:
+            self._counter(endpoint)["cache_avoided_items"] += items
+
+    def snapshot(self):
+        """ Return a copy of the counters per endpoint, their total and the state of the budgets """
+        with self._lock:
+            now = self._clock()
+            endpoints = {name: dict(counter) for name, counter in self._counters.items()}
+            budgets = {}
+            for scope, budget in self.budgets.items():
+                # Expire old spendings so that "used" is current
+                for window in (budget.items, budget.requests):
+                    if window is not None:
+                        window._expire(now)
+                budgets["all" if scope is None else scope] = budget.snapshot()
+
+        total = dict.fromkeys(_COUNTERS, 0)
+        for counter in endpoints.values():
+            for name in _COUNTERS:
+                total[name] += counter[name]
+        return {"endpoints": endpoints, "total": total, "budgets": budgets}
+
+    def reset(self):
+        """ Reset the counters, budgets keep their spendings """
+        with self._lock:
+            self._counters = {}
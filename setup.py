@@ -15,7 +15,9 @@ setup(
     author='Bytesview',
     author_email='contact@bytesview.com',
     license='MIT',
-    install_requires=["requests<3.0.0"],
+    install_requires=[],
+    # Without requests the client falls back to the http.client based HTTPClientSession
+    extras_require={"requests": ["requests<3.0.0"]},
     setup_requires=['pytest-runner'],
     tests_require=['pytest'],
     test_suite='tests',    
@@ -0,0 +1,46 @@
+# Stub sessions standing in for requests in the offline tests.
+import json
+import threading
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode()
+
+    def json(self):
+        return json.loads(self.content.decode())
+
+
+class StubSession(object):
+    """ Records the posted requests and answers them without any network """
+
+    """
+    :param status_codes: Status codes of the first responses, in order, the following ones are 200.
+    :param respond: Optional callable respond(payload) returning (status_code, body), used instead of status_codes.
+    """
+
+    def __init__(self, status_codes = (), respond = None):
+        self.status_codes = list(status_codes)
+        self.respond = respond
+        # (url, data) of every posted request, data is the serialized body as received
+        self.calls = []
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def post(self, url, auth = None, timeout = None, data = None, proxies = None):
+        with self.lock:
+            self.calls.append((url, data))
+            status_code = self.status_codes.pop(0) if self.status_codes else 200
+        if self.respond is not None:
+            status_code, body = self.respond(json.loads(data))
+        else:
+            body = {"results": {"status": status_code}}
+        response = FakeResponse(status_code, body)
+        with self.lock:
+            self.responses.append(response)
+        return response
+
+    def payloads(self):
+        """ Decoded payloads of the posted requests """
+        return [json.loads(data) for _, data in self.calls]
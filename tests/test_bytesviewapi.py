@@ -51,4 +51,21 @@ class test_bytesviwapi(unittest.TestCase):
     def test_topic_api(self):
         response = self.api.topic_api(data = {"key1": "Accounting"}, lang = "en")
         
-        self.assertEqual(response['results']['key1']['label_key'], 0)
\ No newline at end of file
+        self.assertEqual(response['results']['key1']['label_key'], 0)
+
+    def test_dispatch(self):
+        response = self.api.dispatch("sentiment", data = {"key1": "this is my favourite food"}, lang = "en")
+
+        self.assertEqual(response['results']['key1']['label'], 2)
+
+    def test_middleware(self):
+        called = []
+
+        def middleware(endpoint, payload, call_next):
+            called.append(endpoint.name)
+            return call_next(endpoint, payload)
+
+        self.api.add_middleware(middleware)
+        self.api.topic_api(data = {"key1": "Accounting"}, lang = "en")
+
+        self.assertEqual(called, ["topic"])
@@ -0,0 +1,71 @@
+import json
+import unittest
+
+from bytesviewapi import BytesviewApiClient, constants
+from tests.stubs import StubSession
+
+
+class test_dispatch(unittest.TestCase):
+    def setUp(self):
+        self.session = StubSession()
+        self.api = BytesviewApiClient("key", session = self.session)
+
+    def test_payload(self):
+        self.api.sentiment_api(data = {"key1": "this is good"}, lang = "en")
+
+        self.assertEqual(self.session.calls[0][0], constants.SENTIMENT_URL)
+        self.assertEqual(self.session.payloads(), [{"data": {"key1": "this is good"}, "lang": "en"}])
+
+    def test_name_gender_ignores_lang(self):
+        self.api.dispatch("name_gender", data = {"key1": "ron"}, lang = "not a language")
+
+        self.assertEqual(self.session.calls[0][0], constants.NAME_GENDER_URL)
+        self.assertEqual(self.session.payloads(), [{"data": {"key1": "ron"}}])
+
+    def test_unknown_endpoint(self):
+        self.assertRaises(ValueError, self.api.dispatch, "unknown", {"key1": "this is good"})
+        self.assertEqual(self.session.calls, [])
+
+    def test_validation_order(self):
+        # API key is checked first, then data, then language
+        no_key = BytesviewApiClient(session = self.session)
+        with self.assertRaisesRegex(ValueError, "API Key"):
+            no_key.ner_api(data = None, lang = 1)
+        with self.assertRaisesRegex(ValueError, "data can not be empty"):
+            self.api.ner_api(data = None, lang = 1)
+        with self.assertRaisesRegex(TypeError, "dictionary"):
+            self.api.ner_api(data = ["this is good"], lang = 1)
+        with self.assertRaisesRegex(TypeError, "string"):
+            self.api.ner_api(data = {"key1": "this is good"}, lang = 1)
+        with self.assertRaisesRegex(ValueError, "Language code"):
+            self.api.ner_api(data = {"key1": "this is good"}, lang = "xx")
+        self.assertEqual(self.session.calls, [])
+
+    def test_middleware_order(self):
+        order = []
+
+        def middleware(name):
+            def handler(endpoint, payload, call_next):
+                order.append(name)
+                return call_next(endpoint, payload)
+            return handler
+
+        self.api.add_middleware(middleware("first"))
+        self.api.add_middleware(middleware("second"))
+        self.api.topic_api(data = {"key1": "Accounting"}, lang = "en")
+
+        # The last middleware added is the outermost
+        self.assertEqual(order, ["second", "first"])
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_single_compact_serialization(self):
+        session = StubSession(status_codes = [500, 500, 200])
+        api = BytesviewApiClient("key", session = session)
+        api.set_retries(max_retries = 2)
+        data = {"key1": "this is my favourite food", "key2": "this is good"}
+        api.sentiment_api(data = data, lang = "en")
+
+        # Compact JSON, serialized once and reused by the retries
+        self.assertEqual(session.calls[0][1], json.dumps({"data": data, "lang": "en"}, separators = (",", ":")))
+        self.assertEqual(len(session.calls), 3)
+        self.assertTrue(all(body is session.calls[0][1] for _, body in session.calls))
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Generous cold start budget for `import bytesviewapi` and building a client, in seconds
+IMPORT_TIME_BUDGET = 0.25
+
+# Modules which should only be imported when a feature needs them
+LAZY_MODULES = ("requests", "http.client", "ssl", "concurrent.futures", "numpy")
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import bytesviewapi
+from bytesviewapi.transport import HTTPClientSession
+api = bytesviewapi.BytesviewApiClient("key", session=HTTPClientSession())
+print(time.perf_counter() - start)
+print(",".join(name for name in {modules!r} if name in sys.modules))
+"""
+
+
+class test_import_time(unittest.TestCase):
+    def run_import(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, "-c", SCRIPT.format(modules = LAZY_MODULES)], cwd = root)
+        elapsed, loaded = output.decode().splitlines()
+        return float(elapsed), loaded
+
+    def test_import_time(self):
+        # First run may compile the package, measure the second one
+        self.run_import()
+        elapsed, _ = self.run_import()
+
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
+
+    def test_lazy_modules(self):
+        _, loaded = self.run_import()
+
+        self.assertEqual(loaded, "")
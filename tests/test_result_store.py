@@ -0,0 +1,110 @@
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from bytesviewapi.result_store import ResultStore
+
+# Writer killed without flushing or closing the store: 100 single appends, then a stream stopped mid-batch
+CRASHING_WRITER = """
+import os, sys
+from bytesviewapi.result_store import ResultStore
+store = ResultStore(sys.argv[1])
+for i in range(100):
+    store.append("key{}".format(i), {"label": i})
+
+def items():
+    for i in range(100, 2000):
+        if i == 1500:
+            os._exit(0)
+        yield "key{}".format(i), {"label": i}
+
+store.extend(items())
+"""
+
+
+class test_result_store(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = ResultStore(self.path, columns = ("label", "score"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.path)
+
+    def test_append_response(self):
+        self.store.append_response({"results": {"key1": {"label": 2, "score": 0.9}, "key2": {"label": 0}}})
+
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store["key1"], {"label": 2, "score": 0.9})
+        self.assertEqual(list(self.store.keys()), ["key1", "key2"])
+        self.assertEqual(self.store.column("label").tolist(), [2.0, 0.0])
+        self.assertTrue(math.isnan(self.store.column("score")[1]))
+
+    def test_overwrite_key(self):
+        self.store.append("key1", {"label": 2})
+        self.store.append("key1", {"label": 1})
+
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store.rows, 2)
+        self.assertEqual(self.store["key1"], {"label": 1})
+        self.assertEqual(self.store.row_of("key1"), 1)
+
+    def test_missing_key(self):
+        self.assertNotIn("key1", self.store)
+        self.assertIsNone(self.store.get("key1"))
+        self.assertRaises(KeyError, lambda: self.store["key1"])
+
+    def test_reopen(self):
+        self.store.extend(("key{}".format(i), {"label": i % 3}) for i in range(5000))
+        self.store.close()
+        self.store = ResultStore(self.path)
+
+        self.assertEqual(self.store.columns, ("label", "score"))
+        self.assertEqual(len(self.store), 5000)
+        self.assertEqual(self.store["key4999"], {"label": 4999 % 3})
+        self.assertRaises(ValueError, ResultStore, self.path, ("label",))
+
+    def test_unclean_shutdown(self):
+        self.store.close()
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.check_call([sys.executable, "-c", CRASHING_WRITER, self.path], cwd = root)
+        self.store = ResultStore(self.path)
+
+        # Rows of published batches survive, the batch in the write buffers is lost
+        self.assertEqual(len(self.store), self.store.rows)
+        self.assertGreaterEqual(len(self.store), 100)
+        self.assertLess(len(self.store), 1500)
+        self.assertEqual(self.store["key5"], {"label": 5})
+        self.assertEqual(len(self.store.column("label")), self.store.rows)
+
+        self.store.append("key5", {"label": 55})
+        self.store.append("new", {"label": -1})
+        self.assertEqual(self.store["key5"], {"label": 55})
+        self.assertEqual(self.store["new"], {"label": -1})
+
+    def test_truncated_row(self):
+        self.store.extend(("key{}".format(i), {"label": i}) for i in range(10))
+        self.store.close()
+        # Cut the raw result of the last row in half
+        raw_path = os.path.join(self.path, "raw.dat")
+        os.truncate(raw_path, os.path.getsize(raw_path) - 5)
+        self.store = ResultStore(self.path)
+
+        self.assertEqual(len(self.store), 9)
+        self.assertNotIn("key9", self.store)
+        self.assertEqual(len(self.store.column("label")), 9)
+        self.store.append("key9", {"label": 9})
+        self.assertEqual(self.store["key9"], {"label": 9})
+
+    def test_missing_index(self):
+        self.store.extend(("key{}".format(i), {"label": i}) for i in range(3000))
+        self.store.close()
+        os.remove(os.path.join(self.path, "index.dat"))
+        self.store = ResultStore(self.path)
+
+        self.assertEqual(len(self.store), 3000)
+        self.assertEqual(self.store["key2999"], {"label": 2999})
@@ -0,0 +1,98 @@
+import math
+import unittest
+
+from bytesviewapi import BytesviewApiClient
+from bytesviewapi.bytesviewapi_exception import BytesviewException
+from tests.stubs import StubSession
+
+
+def scoring_session(fail_on = None):
+    """ Semantic API stub: strings starting with the same letter score 100, others 10 """
+    def respond(payload):
+        strings = payload["data"]
+        if fail_on in (strings["string1"], strings["string2"]):
+            return 400, {"error": "bad string"}
+        return 200, {"results": {"score": 100 if strings["string1"][0] == strings["string2"][0] else 10}}
+    return StubSession(respond = respond)
+
+
+def scored_pairs(session):
+    return [(payload["data"]["string1"], payload["data"]["string2"]) for payload in session.payloads()]
+
+
+class test_similarity(unittest.TestCase):
+    def setUp(self):
+        self.session = scoring_session()
+        self.api = BytesviewApiClient("key", session = self.session)
+
+    def test_all_pairs(self):
+        matrix = self.api.semantic_matrix(["apple", "avocado", "banana", "blueberry"])
+
+        # Only the upper triangle is requested, the diagonal never is
+        self.assertEqual(len(self.session.calls), 6)
+        self.assertEqual(matrix.to_list(), [[100, 100, 10, 10], [100, 100, 10, 10], [10, 10, 100, 100], [10, 10, 100, 100]])
+
+    def test_duplicate_pairs(self):
+        matrix = self.api.semantic_matrix(["apple"], ["banana", "banana", "avocado", "apple"])
+
+        self.assertEqual(sorted(scored_pairs(self.session)), [("apple", "avocado"), ("apple", "banana")])
+        self.assertEqual(matrix.row(0), [10, 10, 100, 100])
+
+    def test_threshold(self):
+        matrix = self.api.semantic_matrix(["apple", "banana"], ["avocado", "blueberry"], threshold = 50)
+
+        self.assertEqual(matrix[0, 0], 100)
+        self.assertTrue(math.isnan(matrix[0, 1]))
+        self.assertTrue(math.isnan(matrix[1, 0]))
+        self.assertEqual(matrix.top_k(1, 5), [(1, 100)])
+
+    def test_top_k_early_stopping(self):
+        candidates = ["avocado", "apricot", "banana", "blueberry", "cherry"]
+        matrix = self.api.semantic_matrix(["apple"], candidates, top_k = 1, max_workers = 1)
+
+        self.assertLess(len(self.session.calls), len(candidates))
+        self.assertEqual(matrix.top_k(0, 1), [(0, 100)])
+        self.assertTrue(math.isnan(matrix[0, 4]))
+
+    def test_top_k_all_pairs(self):
+        # The diagonal must not count as a neighbour
+        matrix = self.api.semantic_matrix(["apple", "avocado", "banana", "blueberry"], top_k = 1, threshold = 50)
+
+        self.assertGreater(len(self.session.calls), 0)
+        self.assertEqual(matrix[0, 1], 100)
+        self.assertEqual(matrix[1, 0], 100)
+        self.assertEqual(matrix[2, 3], 100)
+        self.assertEqual(matrix[3, 2], 100)
+        self.assertEqual(matrix.top_k(0, 1), [(1, 100)])
+        self.assertEqual(matrix.top_k(3, 1), [(2, 100)])
+        self.assertEqual(matrix.top_k(1, 5), [(0, 100)])
+
+    def test_worker_error(self):
+        api = BytesviewApiClient("key", session = scoring_session(fail_on = "banana"))
+
+        self.assertRaises(BytesviewException, api.semantic_matrix, ["apple", "avocado", "banana"])
+
+    def test_invalid_input(self):
+        self.assertRaises(TypeError, self.api.semantic_matrix, "apple")
+        self.assertRaises(ValueError, self.api.semantic_matrix, [])
+        self.assertRaises(ValueError, self.api.semantic_matrix, ["apple"], top_k = 0)
+
+    def test_invalid_lang(self):
+        # Identical strings make no API call, the language must still be checked
+        with self.assertRaisesRegex(ValueError, "Language code"):
+            self.api.semantic_matrix(["apple", "apple"], lang = "xx")
+        with self.assertRaisesRegex(TypeError, "string"):
+            self.api.semantic_matrix(["apple", "avocado"], lang = 1)
+        self.assertEqual(self.session.calls, [])
+
+    def test_cache_avoided_items(self):
+        self.api.semantic_matrix(["apple", "avocado", "banana", "blueberry"])
+        # Each of the 6 requested pairs also fills its mirrored cell, the diagonal is never counted
+        self.assertEqual(self.api.usage_snapshot()["endpoints"]["semantic"]["cache_avoided_items"], 6)
+
+        self.api.semantic_matrix(["apple"], ["banana", "banana", "avocado", "apple"])
+        # Only the second "banana" is answered from the first request
+        usage = self.api.usage_snapshot()["endpoints"]["semantic"]
+        self.assertEqual(usage["cache_avoided_items"], 7)
+        self.assertEqual(usage["requests"], 8)
+        self.assertEqual(usage["items"], 8)
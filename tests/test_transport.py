@@ -0,0 +1,100 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import http.client
+import json
+import socketserver
+import threading
+import unittest
+
+from bytesviewapi.api_authentication import BytesApiAuth
+from bytesviewapi.transport import HTTPClientSession
+
+
+class Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), Handler)
+        # "keep-alive", "close" to close the connection after answering without telling the client,
+        # or "truncate" to close it in the middle of the response
+        self.mode = "keep-alive"
+        self.requests = []
+        self.closed = threading.Event()
+
+    def shutdown_request(self, request):
+        HTTPServer.shutdown_request(self, request)
+        self.closed.set()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.client_address, dict(self.headers), body))
+
+        out = json.dumps({"results": {"echo": json.loads(body.decode())}}).encode()
+        if self.server.mode == "truncate":
+            self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n" + out[:10])
+            self.close_connection = True
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+        if self.server.mode == "close":
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class test_transport(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        threading.Thread(target = self.server.serve_forever, kwargs = {"poll_interval": 0.05}, daemon = True).start()
+        self.url = "http://127.0.0.1:{}/static/sentiment".format(self.server.server_port)
+        self.session = HTTPClientSession()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, data = '{"data":{}}'):
+        return self.session.post(self.url, auth = BytesApiAuth("secret"), timeout = 5, data = data)
+
+    def test_connection_reuse(self):
+        for i in range(3):
+            response = self.post('{"data":{"key1":"%d"}}' % i)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"results": {"echo": {"data": {"key1": "2"}}}})
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(set(address for address, _, _ in self.server.requests)), 1)
+
+    def test_auth_headers(self):
+        self.post()
+        headers = self.server.requests[0][1]
+
+        self.assertEqual(headers["x-access-token"], "secret")
+        self.assertEqual(headers["Content-Type"], "Application/JSON")
+
+    def test_server_closed_idle_connection(self):
+        self.server.mode = "close"
+        self.post()
+        self.assertTrue(self.server.closed.wait(5))
+
+        response = self.post()
+
+        # The stale connection is replaced, and the server sees each request once
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(len(set(address for address, _, _ in self.server.requests)), 2)
+
+    def test_no_retry_after_response_started(self):
+        self.post()
+        self.server.mode = "truncate"
+
+        self.assertRaises(http.client.IncompleteRead, self.post)
+        self.assertEqual(len(self.server.requests), 2)
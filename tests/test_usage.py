@@ -0,0 +1,137 @@
+import unittest
+
+from bytesviewapi import BytesviewApiClient
+from bytesviewapi.bytesviewapi_exception import BudgetExceededException, BytesviewException
+from bytesviewapi.helpers import dumps
+from bytesviewapi.usage import UsageTracker
+from tests.stubs import StubSession
+
+
+class test_usage(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.slept = []
+        self.usage = UsageTracker(clock = lambda: self.now, sleep = self.sleep)
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def test_counters(self):
+        self.usage.before_request("sentiment", 2, 100)
+        self.usage.before_retry("sentiment", 100)
+        self.usage.record_response("sentiment", 40)
+        self.usage.record_cache_avoided("semantic", 3)
+        snapshot = self.usage.snapshot()
+
+        self.assertEqual(snapshot["endpoints"]["sentiment"], {"items": 2, "requests": 2, "retries": 1, "cache_avoided_items": 0,
+                                                              "request_bytes": 200, "response_bytes": 40})
+        self.assertEqual(snapshot["total"]["cache_avoided_items"], 3)
+
+    def test_throttle(self):
+        self.usage.set_budget(requests_per_minute = 2)
+        for _ in range(3):
+            self.usage.before_request("ner", 1, 10)
+
+        self.assertEqual(self.slept, [60])
+        self.assertEqual(self.usage.snapshot()["budgets"]["all"]["requests_per_minute"], {"limit": 2, "used": 1})
+
+    def test_refuse(self):
+        self.usage.set_budget(endpoint = "topic", items_per_day = 3, on_exceed = "refuse")
+        self.usage.before_request("topic", 2, 10)
+        # Other endpoints are not limited by the topic budget
+        self.usage.before_request("ner", 5, 10)
+
+        self.assertRaises(BudgetExceededException, self.usage.before_request, "topic", 2, 10)
+        self.assertEqual(self.usage.snapshot()["endpoints"]["topic"]["requests"], 1)
+
+    def test_max_wait(self):
+        self.usage.set_budget(requests_per_minute = 1, max_wait = 10)
+        self.usage.before_request("intent", 1, 10)
+
+        self.assertRaises(BudgetExceededException, self.usage.before_retry, "intent", 10)
+        self.assertEqual(self.slept, [])
+
+    def test_update_keeps_spendings(self):
+        self.usage.set_budget(items_per_day = 5, on_exceed = "refuse")
+        self.usage.before_request("ner", 4, 10)
+        # Setting the same limit again does not reset what was spent
+        self.usage.set_budget(items_per_day = 5)
+
+        self.assertRaises(BudgetExceededException, self.usage.before_request, "ner", 2, 10)
+        self.usage.set_budget(items_per_day = 6)
+        self.usage.before_request("ner", 2, 10)
+        self.assertEqual(self.usage.snapshot()["budgets"]["all"], {"items_per_day": {"limit": 6, "used": 6}})
+
+    def test_clear_budget(self):
+        self.usage.set_budget(items_per_day = 1, requests_per_minute = 1, on_exceed = "refuse")
+        self.usage.clear_budget(limits = ["requests_per_minute"])
+        self.assertEqual(self.usage.snapshot()["budgets"]["all"], {"items_per_day": {"limit": 1, "used": 0}})
+
+        self.assertRaises(ValueError, self.usage.clear_budget, limits = ["items"])
+        self.usage.clear_budget(limits = ["items_per_day"])
+        self.assertEqual(self.usage.snapshot()["budgets"], {})
+        self.assertRaises(ValueError, self.usage.set_budget, on_exceed = "refuse")
+
+
+class test_client_usage(unittest.TestCase):
+    def setUp(self):
+        self.session = StubSession()
+        self.api = BytesviewApiClient("key", session = self.session)
+
+    def test_retries(self):
+        self.session.status_codes = [500, 200]
+        self.api.set_retries(max_retries = 2)
+        data = {"key1": "this is good", "key2": "this is bad", "key3": "this is it"}
+        self.api.sentiment_api(data = data, lang = "en")
+
+        body = dumps({"data": data, "lang": "en"})
+        self.assertEqual(self.api.usage_snapshot()["endpoints"]["sentiment"], {
+            "items": 3, "requests": 2, "retries": 1, "cache_avoided_items": 0,
+            "request_bytes": 2 * len(body),
+            "response_bytes": sum(len(response.content) for response in self.session.responses)})
+
+    def test_semantic_is_one_item(self):
+        self.api.semantic_api(data = {"string1": "this is good", "string2": "this is great"}, lang = "en")
+
+        self.assertEqual(self.api.usage_snapshot()["endpoints"]["semantic"]["items"], 1)
+
+    def test_unknown_budget_endpoint(self):
+        self.assertRaises(ValueError, self.api.set_budget, items_per_day = 10, endpoint = "unknown")
+
+    def test_refused_request_is_not_sent(self):
+        self.api.set_budget(items_per_day = 2, endpoint = "sentiment", on_exceed = "refuse")
+
+        self.assertRaises(BudgetExceededException, self.api.sentiment_api, data = {"a": "x", "b": "y", "c": "z"})
+        self.assertEqual(self.session.calls, [])
+        self.assertNotIn("sentiment", self.api.usage_snapshot()["endpoints"])
+
+        # Other endpoints are not limited, and removing the budget allows the request
+        self.api.ner_api(data = {"a": "x", "b": "y", "c": "z"})
+        self.api.clear_budget(endpoint = "sentiment")
+        self.api.sentiment_api(data = {"a": "x", "b": "y", "c": "z"})
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_limits_are_merged(self):
+        self.api.set_budget(items_per_day = 2, on_exceed = "refuse")
+        self.api.set_budget(requests_per_minute = 30)
+
+        self.assertRaises(BudgetExceededException, self.api.sentiment_api, data = {"a": "x", "b": "y", "c": "z"})
+        self.assertEqual(self.session.calls, [])
+        self.assertEqual(self.api.usage_snapshot()["budgets"]["all"], {
+            "items_per_day": {"limit": 2, "used": 0}, "requests_per_minute": {"limit": 30, "used": 0}})
+
+    def test_budget_stops_retries(self):
+        self.session.status_codes = [500] * 10
+        self.api.set_retries(max_retries = 5)
+        self.api.set_budget(requests_per_minute = 2, on_exceed = "refuse")
+
+        self.assertRaises(BudgetExceededException, self.api.intent_api, data = {"key1": "subscribe"})
+        self.assertEqual(len(self.session.calls), 2)
+        self.assertEqual(self.api.usage_snapshot()["endpoints"]["intent"]["retries"], 1)
+
+    def test_error_response(self):
+        self.session.status_codes = [400]
+
+        self.assertRaises(BytesviewException, self.api.topic_api, data = {"key1": "Accounting"})
+        self.assertEqual(self.api.usage_snapshot()["endpoints"]["topic"]["requests"], 1)